@@ -0,0 +1,122 @@
+"""
+cli.py
+======
+
+Single entry point for the droplet analysis scripts. Each subcommand runs the `main` function of one script:
+
+* detect: find_drops.py
+* report: report_early.py
+* spatial: spatial_stats.py
+* overlay: overlay.py
+* preview: gen_preview.py
+* compare: compare_detection.py
+* stack: stackshot_preprocess.py
+* queue: job_queue.py
+
+Only `argparse` is imported at startup. The script of a subcommand, together with its heavy dependencies (cv2, pandas, matplotlib, scipy), is imported after the arguments are parsed, so `--help` and argument errors return immediately. The scripts can still be run directly, e.g. `python find_drops.py img_path`, which is equivalent to `python cli.py detect img_path`.
+
+Syntax
+------
+python cli.py {detect,report,spatial,overlay,preview,compare,stack,queue} ...
+
+Edit
+----
+* Oct 19, 2026: Initial commit.
+* Oct 19, 2026: Add the queue subcommand.
+* Oct 19, 2026: Add the --depth option of the I/O pipeline to detect, overlay and queue submit.
+"""
+
+import argparse
+import importlib
+
+def add_detect_arguments(parser):
+    """Adds the options of the droplet detection, shared by "detect" and "queue submit"."""
+    parser.add_argument("--minThreshold", type=int, default=0, help="min threshold for blob detection")
+    parser.add_argument("--maxThreshold", type=int, default=255, help="max threshold for blob detection")
+    parser.add_argument("--circularity", type=float, default=.5, help="min area for blob detection")
+    parser.add_argument("--convexity", type=float, default=.5, help="min convexity for blob detection")
+    parser.add_argument("--inertia", type=float, default=.5, help="min inertia ratio for blob detection")
+    parser.add_argument("--refine", type=bool, default=True, help="whether to refine the detected droplets")
+    parser.add_argument("--depth", type=int, default=4, help="number of frames read ahead and results waiting to be written")
+
+def add_report_arguments(parser):
+    """Adds the options of the report, shared by "report" and "queue submit"."""
+    parser.add_argument("-n", type=int, default=5, help="Number of bins for volume and flux calculation.")
+    parser.add_argument("-o", type=float, default=0, help="fraction of overlap in binning.")
+    parser.add_argument("-j", type=int, default=None, help="Number of worker processes for spatial statistics, default to the number of CPUs.")
+
+def build_parser():
+    """Builds the argument parser of all the subcommands. Each subparser records the script module to run in `args.module`."""
+    parser = argparse.ArgumentParser(description="Droplet analysis tools.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    p = subparsers.add_parser("detect", help="Find droplets in the images.", description="Find droplets in the images")
+    p.add_argument("img_path", type=str, help="Path to the images to be analyzed")
+    add_detect_arguments(p)
+    p.set_defaults(module="find_drops")
+
+    p = subparsers.add_parser("report", help="Generate report graphs for early data.", description="Generate report graphs for early data.")
+    p.add_argument("folder", type=str, help="Path to the folder containing the droplet detection results.")
+    add_report_arguments(p)
+    p.add_argument("--output", type=str, default=None, help="Folder to save nrvf.h5 and report_early.pdf, default to folder.")
+    p.set_defaults(module="report_early")
+
+    p = subparsers.add_parser("spatial", help="Compute spatial statistics of the detected droplets.", description="Compute spatial statistics of the detected droplets.")
+    p.add_argument("folder", type=str, help="Path to the folder containing the droplet detection results.")
+    p.add_argument("-j", type=int, default=None, help="Number of worker processes, default to the number of CPUs.")
+    p.add_argument("--rmax", type=float, default=None, help="Max r (px) of the pair-correlation function.")
+    p.add_argument("--nbins", type=int, default=50, help="Number of r bins of the pair-correlation function.")
+    p.set_defaults(module="spatial_stats")
+
+    p = subparsers.add_parser("overlay", help="Overlay droplets on images.", description="Overlay droplets on images")
+    p.add_argument("folder", type=str, help="Folder containing images and data")
+    p.add_argument("--dpi", type=int, default=300, help="Set the dpi of the saved images")
+    p.add_argument("--depth", type=int, default=4, help="Number of images read ahead and overlays waiting to be saved")
+    p.set_defaults(module="overlay")
+
+    p = subparsers.add_parser("preview", help="Generate preview of droplet detection.", description="Generate preview of droplet detection")
+    p.add_argument("video_path", type=str, help="Path to the video file")
+    p.set_defaults(module="gen_preview")
+
+    p = subparsers.add_parser("compare", help="Compare detection parameters with the ground truth.", description="Compare detection parameters with the ground truth.")
+    p.add_argument("folder", type=str, nargs="?", default=r"G:\My Drive\Research projects\F\Data\compare_params", help="Folder containing ground_truth.csv and the scan_params subfolder.")
+    p.set_defaults(module="compare_detection")
+
+    p = subparsers.add_parser("stack", help="Put stackshot images in separate folders.", description="Put stackshot images in separate folders, each of which contains a single stack of images. This is a necessary preprocessing for the program CZPBatch.exe to work properly. The folders will be named as stack%04d, starting from 0.")
+    p.add_argument("image_folder", type=str, help="The folder of images to be processed.")
+    p.add_argument("nImages", type=int, help="The number of images per stack.")
+    p.add_argument("-r", "--reverse", default=0, help="Reverse action, to move images back to the original folder.")
+    p.set_defaults(module="stackshot_preprocess")
+
+    p = subparsers.add_parser("queue", help="Distribute detection and reports across machines.", description="Distribute detection and reports across machines sharing a drive.")
+    actions = p.add_subparsers(dest="action", required=True)
+    q = actions.add_parser("submit", help="Submit jobs.")
+    q.add_argument("queue_dir", type=str, help="Queue folder on the shared drive.")
+    q.add_argument("folders", type=str, nargs="+", help="Experiment folders.")
+    q.add_argument("--kind", type=str, choices=["detect", "report"], default="detect", help="detect: batches of frames; report: whole folders.")
+    q.add_argument("--batch", type=int, default=50, help="Number of frames per detect job.")
+    add_detect_arguments(q)
+    add_report_arguments(q)
+    q = actions.add_parser("work", help="Run jobs until the queue is empty.")
+    q.add_argument("queue_dir", type=str, help="Queue folder on the shared drive.")
+    q.add_argument("--lease", type=float, default=300, help="Lease time (s), renewed by the heartbeat while a job runs.")
+    q.add_argument("--poll", type=float, default=5, help="Time (s) between two polls of an empty queue.")
+    q.add_argument("--keep-alive", action="store_true", help="Wait for new jobs instead of exiting when the queue is empty.")
+    q = actions.add_parser("collect", help="Merge the results of the done jobs into the experiment folders.")
+    q.add_argument("queue_dir", type=str, help="Queue folder on the shared drive.")
+    q.add_argument("--wait", action="store_true", help="Keep merging until all the jobs are finished.")
+    q.add_argument("--poll", type=float, default=5, help="Time (s) between two merges.")
+    q = actions.add_parser("status", help="Print the number of jobs in each status, and the errors of the failed jobs.")
+    q.add_argument("queue_dir", type=str, help="Queue folder on the shared drive.")
+    p.set_defaults(module="job_queue")
+
+    return parser
+
+def main(argv=None):
+    """Parses argv and runs the corresponding script. The script module is only imported here."""
+    args = build_parser().parse_args(argv)
+    module = importlib.import_module(args.module)
+    return module.main(args)
+
+if __name__ == "__main__":
+    main()
@@ -7,13 +7,14 @@ This script is used to compare the droplet detection parameters. It runs the det
 Syntax
 ------
 ```
-python compare_detection.py
+python compare_detection.py [folder]
 ```
 
 Edit
 ----
 Oct 09, 2024: Initial commit.
 Jan 20, 2025: Separate the detection and evaluation functions.
+Oct 19, 2026: Move the evaluation loop to `main`, and take the folder as an optional argument, so that the script can be run by `cli.py compare`.
 """
 
 import cv2
@@ -22,6 +23,7 @@ import pandas as pd
 from scipy.spatial import KDTree
 from myimagelib.myImageLib import readdata
 import os
+import sys
 import pdb
 
 def count_overlapping_points_with_tolerance(list1, list2, tolerance):
@@ -69,9 +71,9 @@ def evaluate_detection(ground_truth, detected, tol=5):
 
     return tp, fp, sa
 
-if __name__ == "__main__":
-
-    folder = r"G:\My Drive\Research projects\F\Data\compare_params"
+def main(args):
+    """Evaluates the detection results in args.folder/scan_params against args.folder/ground_truth.csv and saves the scores in results.csv."""
+    folder = args.folder
     min_detected = 100
     tol_list = range(1, 6)
     l = readdata(os.path.join(folder, "scan_params"), "csv")
@@ -95,3 +97,8 @@ if __name__ == "__main__":
 
     data = pd.concat(df_list)
     data.to_csv(os.path.join(folder, "results.csv"), index=False)
+
+if __name__ == "__main__":
+    # the arguments are defined in cli.py
+    from cli import main as cli_main
+    cli_main(["compare"] + sys.argv[1:])
@@ -15,7 +15,7 @@ Syntax
 ------
 
 ```
-python find_drops.py img_path [--minThreshold minThreshold --maxThreshold maxThreshold --circularity circularity --convexity convexity --inertia inertia]
+python find_drops.py img_path [--minThreshold minThreshold --maxThreshold maxThreshold --circularity circularity --convexity convexity --inertia inertia --depth depth]
 ```
 
 
@@ -28,14 +28,19 @@ Sep 18, 2024: Add tolerance to expand_blob function.
 Oct 07, 2024: Add refine_with_hough function to refine the detected droplets using Hough circle transform.
 Oct 14, 2024: Process images in separate files, instead of a video. This allows for easier testing on individual frames.
 Jan 21, 2025: Modify docstring to reflect the current syntax
+Oct 19, 2026: Move the frame loop to `main`, so that the script can be run by `cli.py detect`.
+Oct 19, 2026: Move the detection of one frame to `find_drops`, so that batches of frames can be run by `job_queue.py`.
+Oct 19, 2026: Prefetch the frames and write the .csv files in background threads (see `pipeline.py`), with the queue depth set by --depth.
+Oct 19, 2026: Note that only the reading, decoding and file writes overlap with the detection. `df.to_csv` formats the text while holding the GIL, so it still competes with the detection.
 """
 
 import cv2
 import numpy as np
 import pandas as pd
 import os
-import argparse
+import sys
 from myimagelib.myImageLib import show_progress, readdata
+from pipeline import prefetch, AsyncWriter
 import pdb
 
 #function to exrtract frames from a video file
@@ -135,44 +140,42 @@ def refine_with_hough(image, keypoint):
     else:
         return x, y, r*2
 
-if __name__ == "__main__":
-
-    # parse the input arguments
-    parser = argparse.ArgumentParser(description="Find droplets in the video")
-    parser.add_argument("img_path", type=str, help="Path to the images to be analyzed")
-    parser.add_argument("--minThreshold", type=int, default=0, help="min threshold for blob detection")
-    parser.add_argument("--maxThreshold", type=int, default=255, help="max threshold for blob detection")
-    parser.add_argument("--circularity", type=float, default=.5, help="min area for blob detection")
-    parser.add_argument("--convexity", type=float, default=.5, help="min convexity for blob detection")
-    parser.add_argument("--inertia", type=float, default=.5, help="min inertia ratio for blob detection")
-    parser.add_argument("--refine", type=bool, default=True, help="whether to refine the detected droplets")
-    args = parser.parse_args()
+def find_drops(frame, args):
+    """Detects the droplets in a frame read by `cv2.imread`. Returns a DataFrame of the x, y coordinates and the radius of the droplets."""
+    # detect droplets
+    processed = preprocess(frame)
+    keypoints = detect_droplets(processed, args)
+
+    # save the data in a csv file
+    data = [[keypoint.pt[0], keypoint.pt[1], keypoint.size / 2] for keypoint in keypoints]
+
+    # refine detected droplets
+    if args.refine:
+        refined_keypoints = []
+        for j, keypoint in enumerate(keypoints):
+            # here, we experiment different methods to refine the detected droplets
+            # available methods: expand_blob, refine_with_hough
+            refined_keypoints.append(refine_with_hough(processed, keypoint))
+            show_progress(j/len(keypoints), label=f"Refining {j+1:d}/{len(keypoints):d}")
+        data = [[keypoint[0], keypoint[1], keypoint[2] / 2] for keypoint in refined_keypoints]
     
+    return pd.DataFrame(data, columns=["x", "y", "r"])
+
+def main(args):
+    """Detects the droplets in all the images in args.img_path and saves the results as {name}.csv next to the images."""
     img_path = args.img_path
 
     l = readdata(img_path, "jpg")
-    for num, i in l.iterrows():
-        frame = cv2.imread(i.Dir)
-
-        # detect droplets
-        processed = preprocess(frame)
-        keypoints = detect_droplets(processed, args)
-
-        # save the data in a csv file
-        data = [[keypoint.pt[0], keypoint.pt[1], keypoint.size / 2] for keypoint in keypoints]
-
-        # refine detected droplets
-        if args.refine:
-            refined_keypoints = []
-            for j, keypoint in enumerate(keypoints):
-                # here, we experiment different methods to refine the detected droplets
-                # available methods: expand_blob, refine_with_hough
-                refined_keypoints.append(refine_with_hough(processed, keypoint))
-                show_progress(j/len(keypoints), label=f"Refining {j+1:d}/{len(keypoints):d}")
-            data = [[keypoint[0], keypoint[1], keypoint[2] / 2] for keypoint in refined_keypoints]
-        
-        df = pd.DataFrame(data, columns=["x", "y", "r"])
-        # test params save
-        # df.to_csv(os.path.join(img_path, f"min_{args.minThreshold:d}_max_{args.maxThreshold:d}_cir_{args.circularity:.1f}_con_{args.convexity:.1f}_ine_{args.inertia:.1f}.csv"), index=False)
-        # image process save
-        df.to_csv(os.path.join(img_path, f"{i.Name}.csv"), index=False)
\ No newline at end of file
+    # read the upcoming frames and write the results in the background, while the current frame is processed
+    with AsyncWriter(depth=args.depth) as writer:
+        for name, frame in zip(l.Name, prefetch(l.Dir, cv2.imread, depth=args.depth)):
+            df = find_drops(frame, args)
+            # test params save
+            # writer.submit(df.to_csv, os.path.join(img_path, f"min_{args.minThreshold:d}_max_{args.maxThreshold:d}_cir_{args.circularity:.1f}_con_{args.convexity:.1f}_ine_{args.inertia:.1f}.csv"), index=False)
+            # image process save
+            writer.submit(df.to_csv, os.path.join(img_path, f"{name}.csv"), index=False)
+
+if __name__ == "__main__":
+    # the arguments are defined in cli.py
+    from cli import main as cli_main
+    cli_main(["detect"] + sys.argv[1:])
@@ -13,13 +13,14 @@ python gen_preview.py video_path
 Edit
 ----
 Sep 12, 2024: Initial commit.
+Oct 19, 2026: Move the frame loop to `main`, so that the script can be run by `cli.py preview`.
 """
 
 import cv2
 import numpy as np
 import pandas as pd
 import os
-import argparse
+import sys
 from myimagelib.myImageLib import show_progress, readdata
 import matplotlib.pyplot as plt
 
@@ -33,12 +34,8 @@ def get_frame_from_video(video_path, frame_number):
         raise ValueError(f"Could not read frame {frame_number}")
     return frame
 
-if __name__ == "__main__":
-    # process arguments
-    parser = argparse.ArgumentParser(description='Generate preview of droplet detection')
-    parser.add_argument('video_path', type=str, help='Path to the video file')
-    args = parser.parse_args()
-
+def main(args):
+    """Draws the detected droplets on the frames of args.video_path and makes a preview video."""
     # process paths
     video_path = args.video_path
     folder, filename = os.path.split(video_path)
@@ -93,4 +90,9 @@ if __name__ == "__main__":
         cv2.imwrite(os.path.join(blob_folder, f"{frame_num:04d}.jpg"), frame)
     
     # create video from images
-    os.system(f"ffmpeg -f concat -safe 0 -i {os.path.join(overlay_folder, 'filelist.txt')} -vf \"scale=trunc(iw/2)*2:trunc(ih/2)*2,format=yuv420p\" -c:v libx264 -r 10 {os.path.join(blob_folder, 'preview.mp4')} -y")
\ No newline at end of file
+    os.system(f"ffmpeg -f concat -safe 0 -i {os.path.join(overlay_folder, 'filelist.txt')} -vf \"scale=trunc(iw/2)*2:trunc(ih/2)*2,format=yuv420p\" -c:v libx264 -r 10 {os.path.join(blob_folder, 'preview.mp4')} -y")
+
+if __name__ == "__main__":
+    # the arguments are defined in cli.py
+    from cli import main as cli_main
+    cli_main(["preview"] + sys.argv[1:])
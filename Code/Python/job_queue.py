@@ -0,0 +1,290 @@
+"""
+job_queue.py
+============
+
+This script distributes the droplet detection and the report generation across several machines that mount the same data drive. The jobs are kept in a SQLite database `jobs.db` in a queue folder on the shared drive:
+
+* a "detect" job is a batch of frames of an experiment folder. The worker saves the {name}.csv files in a staging folder `queue_dir/results/{job_id}_{worker}`, and the coordinator ("collect") moves them into the experiment folder once the job is done;
+* a "report" job is an experiment folder, on which the worker runs `report_early.py`. The outputs are staged and merged in the same way.
+
+A worker leases one job at a time. While the job runs, a background thread renews the lease ("heartbeat"), retrying when the database is locked. If the lease is lost anyway, the worker drops the job and its staged results. If a worker dies, its lease expires and the job goes back to the queue, until it has been tried `max_attempts` times. The leases are compared with the wall clock of each machine, so the clocks should be synchronized (NTP) and the lease time should be much longer than the clock offsets.
+
+Typical usage: submit the detect jobs, start a worker on each machine, and collect the results. When the detection is merged, submit the report jobs in the same way.
+
+Syntax
+------
+python job_queue.py submit queue_dir folder [folder ...] [--kind detect|report] [--batch batch] [detection and report options]
+python job_queue.py work queue_dir [--lease lease] [--poll poll] [--keep-alive]
+python job_queue.py collect queue_dir [--wait] [--poll poll]
+python job_queue.py status queue_dir
+
+Edit
+----
+* Oct 19, 2026: Initial commit.
+* Oct 19, 2026: Prefetch the frames and write the .csv files of detect jobs in background threads.
+* Oct 19, 2026: (i) Retry the heartbeat on a locked database and tell the worker when the lease is lost. (ii) Stage the report outputs. (iii) Read the lease time inside the lock. (iv) Remove the staging folders of expired and failed leases in collect.
+* Oct 19, 2026: (i) Roll back when COMMIT fails, and reconnect the heartbeat after a database error. (ii) In collect, list the staging folders before reading the running leases, and requeue done jobs whose staging folder is missing.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import sqlite3
+import argparse
+import threading
+import traceback
+from contextlib import contextmanager
+from pipeline import prefetch, AsyncWriter
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    staging TEXT,
+    error TEXT,
+    submitted REAL,
+    finished REAL
+)
+"""
+
+def connect(queue_dir):
+    """Opens the job database in queue_dir, creating it if needed. Transactions are managed explicitly with `transaction`."""
+    os.makedirs(queue_dir, exist_ok=True)
+    # rollback journal instead of WAL: WAL needs shared memory, which does not work on network drives
+    con = sqlite3.connect(os.path.join(queue_dir, "jobs.db"), timeout=60, isolation_level=None)
+    con.row_factory = sqlite3.Row
+    con.execute(SCHEMA)
+    return con
+
+@contextmanager
+def transaction(con):
+    """Runs the enclosed statements in a write transaction, which locks the database against the other workers."""
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        yield con
+        # COMMIT may fail too (database busy), and must not leave the connection in the transaction
+        con.execute("COMMIT")
+    except:
+        if con.in_transaction:
+            con.execute("ROLLBACK")
+        raise
+
+def submit(con, kind, folder, payload):
+    """Adds a job to the queue and returns its id."""
+    with transaction(con):
+        cur = con.execute("INSERT INTO jobs (kind, folder, payload, submitted) VALUES (?, ?, ?, ?)", (kind, os.path.abspath(folder), json.dumps(payload), time.time()))
+    return cur.lastrowid
+
+def lease(con, worker, lease_time, max_attempts=3):
+    """Leases the oldest pending job to worker for lease_time seconds. Expired leases are put back to the queue first, or marked as failed after max_attempts. Returns the job row, or None if no job is pending."""
+    with transaction(con):
+        # read the clock after the lock is acquired, which may take up to the connection timeout
+        now = time.time()
+        con.execute("UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, worker = NULL, error = 'lease expired' WHERE status = 'leased' AND lease_expires < ?", (max_attempts, now))
+        job = con.execute("SELECT * FROM jobs WHERE status = 'pending' ORDER BY id LIMIT 1").fetchone()
+        if job is None:
+            return None
+        con.execute("UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 WHERE id = ?", (worker, now + lease_time, job["id"]))
+    return job
+
+def heartbeat(con, job_id, worker, lease_time):
+    """Renews the lease of a job. Returns False if the lease has been lost, i.e. it expired and the job went to another worker."""
+    with transaction(con):
+        cur = con.execute("UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'leased'", (time.time() + lease_time, job_id, worker))
+    return cur.rowcount == 1
+
+def complete(con, job_id, worker, staging=None):
+    """Marks a job as done. Returns False if the lease has been lost, in which case the result should be discarded."""
+    with transaction(con):
+        cur = con.execute("UPDATE jobs SET status = 'done', staging = ?, error = NULL, finished = ? WHERE id = ? AND worker = ? AND status = 'leased'", (staging, time.time(), job_id, worker))
+    return cur.rowcount == 1
+
+def fail(con, job_id, worker, error, max_attempts=3):
+    """Puts a job that raised an error back to the queue, or marks it as failed after max_attempts."""
+    with transaction(con):
+        con.execute("UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, worker = NULL, error = ? WHERE id = ? AND worker = ? AND status = 'leased'", (max_attempts, error, job_id, worker))
+
+def count(con):
+    """Returns the number of jobs in each status."""
+    return {row["status"]: row["n"] for row in con.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+
+class LeaseLost(Exception):
+    """Raised by a handler when the lease of its job has been lost, so that it stops working on a job now owned by another worker."""
+
+def run_detect(job, staging, lost):
+    """Detects the droplets in the frames of a detect job and saves the {name}.csv files in staging. Stops if the lease is lost."""
+    import cv2
+    from find_drops import find_drops
+    payload = json.loads(job["payload"])
+    params = argparse.Namespace(**payload["params"])
+    depth = payload["params"].get("depth", 4)
+    paths = [os.path.join(job["folder"], f"{name}.jpg") for name in payload["names"]]
+    with AsyncWriter(depth=depth) as writer:
+        for name, frame in zip(payload["names"], prefetch(paths, cv2.imread, depth=depth)):
+            if lost.is_set():
+                raise LeaseLost(f"Lease of job {job['id']:d} lost")
+            if frame is None:
+                raise FileNotFoundError(f"Could not read frame {name} in {job['folder']}")
+            writer.submit(find_drops(frame, params).to_csv, os.path.join(staging, f"{name}.csv"), index=False)
+
+def run_report(job, staging, lost):
+    """Runs report_early.py on the experiment folder of a report job. The outputs (nrvf.h5, report_early.pdf) are saved in staging, so that a worker that lost its lease never writes in the experiment folder."""
+    from report_early import main as report
+    payload = json.loads(job["payload"])
+    if lost.is_set():
+        raise LeaseLost(f"Lease of job {job['id']:d} lost")
+    report(argparse.Namespace(folder=job["folder"], output=staging, **payload["params"]))
+
+HANDLERS = {"detect": run_detect, "report": run_report}
+
+def _keep_leased(queue_dir, job_id, worker, lease_time, stop, lost):
+    """Heartbeat thread: renews the lease every 1/3 of lease_time until stop is set. If the lease is taken by another worker, or cannot be renewed for lease_time because the database stays locked, lost is set to tell the worker to drop the job. The thread uses its own connection, because sqlite connections cannot be shared between threads."""
+    con = None
+    renewed = time.time()
+    while not stop.wait(lease_time / 3):
+        try:
+            if con is None:
+                con = connect(queue_dir)
+            if not heartbeat(con, job_id, worker, lease_time):
+                lost.set()
+                break
+            renewed = time.time()
+        except sqlite3.OperationalError:
+            # database locked longer than the timeout, e.g. on a busy network drive: retry at the next beat, on a fresh connection
+            if con is not None:
+                con.close()
+                con = None
+            if time.time() - renewed > lease_time:
+                lost.set()
+                break
+    if con is not None:
+        con.close()
+
+def work(queue_dir, worker=None, lease_time=300, poll=5, keep_alive=False, max_attempts=3):
+    """Runs jobs from the queue until no job is pending or leased, or forever if keep_alive is set. Returns the number of jobs completed by this worker."""
+    if worker is None:
+        worker = f"{socket.gethostname()}-{os.getpid()}"
+    con = connect(queue_dir)
+    n_done = 0
+    while True:
+        job = lease(con, worker, lease_time, max_attempts=max_attempts)
+        if job is None:
+            # jobs leased by other workers may still expire and come back to the queue
+            if not keep_alive and count(con).get("leased", 0) == 0:
+                break
+            time.sleep(poll)
+            continue
+
+        print(f"{worker}: {job['kind']} job {job['id']:d} ({job['folder']})")
+        staging = os.path.join(queue_dir, "results", f"{job['id']:06d}_{worker}")
+        os.makedirs(staging, exist_ok=True)
+        stop = threading.Event()
+        lost = threading.Event()
+        keeper = threading.Thread(target=_keep_leased, args=(queue_dir, job["id"], worker, lease_time, stop, lost), daemon=True)
+        keeper.start()
+        try:
+            HANDLERS[job["kind"]](job, staging, lost)
+        except Exception as e:
+            stop.set()
+            keeper.join()
+            if not isinstance(e, LeaseLost):
+                fail(con, job["id"], worker, traceback.format_exc(), max_attempts=max_attempts)
+            shutil.rmtree(staging, ignore_errors=True)
+            continue
+        stop.set()
+        keeper.join()
+        if not lost.is_set() and complete(con, job["id"], worker, staging):
+            n_done += 1
+        else:
+            # the lease expired and the job went to another worker
+            shutil.rmtree(staging, ignore_errors=True)
+    con.close()
+    return n_done
+
+def collect(con, queue_dir, max_attempts=3):
+    """Moves the staged results of the done jobs into their experiment folders, and marks these jobs as merged. A done job whose staging folder is missing is put back to the queue, or marked as failed after max_attempts. The staging folders left by expired or failed leases are removed. Returns the number of jobs merged."""
+    jobs = con.execute("SELECT * FROM jobs WHERE status = 'done'").fetchall()
+    n_merged = 0
+    for job in jobs:
+        staging = job["staging"]
+        if staging is None or not os.path.exists(staging):
+            with transaction(con):
+                con.execute("UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, worker = NULL, error = ? WHERE id = ? AND status = 'done'", (max_attempts, f"staging folder missing: {staging}", job["id"]))
+            continue
+        for filename in os.listdir(staging):
+            shutil.move(os.path.join(staging, filename), os.path.join(job["folder"], filename))
+        shutil.rmtree(staging)
+        with transaction(con):
+            con.execute("UPDATE jobs SET status = 'merged' WHERE id = ?", (job["id"],))
+        n_merged += 1
+
+    # keep only the staging folders of running leases and of jobs done since the query above.
+    # The folders are listed before the jobs are queried, so that a folder created by a new lease in between is never removed.
+    results = os.path.join(queue_dir, "results")
+    if os.path.exists(results):
+        folders = next(os.walk(results))[1]
+        keep = {f"{job['id']:06d}_{job['worker']}" for job in con.execute("SELECT id, worker FROM jobs WHERE status IN ('leased', 'done')")}
+        for sf in folders:
+            if sf not in keep:
+                shutil.rmtree(os.path.join(results, sf), ignore_errors=True)
+    return n_merged
+
+def submit_folders(con, folders, kind, params, batch=50):
+    """Submits the jobs of each experiment folder: batches of `batch` frames for "detect", the whole folder for "report". Returns the ids of the jobs."""
+    ids = []
+    for folder in folders:
+        if not os.path.exists(folder):
+            raise FileNotFoundError(f"The specified folder does not exist: {folder}")
+        if kind == "detect":
+            from myimagelib import readdata
+            names = list(readdata(folder, "jpg").Name)
+            for start in range(0, len(names), batch):
+                ids.append(submit(con, kind, folder, {"names": names[start:start+batch], "params": params}))
+        else:
+            ids.append(submit(con, kind, folder, {"params": params}))
+    return ids
+
+def main(args):
+    """Runs the queue action args.action on the queue in args.queue_dir."""
+    queue_dir = os.path.abspath(args.queue_dir)
+    if args.action == "submit":
+        con = connect(queue_dir)
+        if args.kind == "detect":
+            params = {kw: getattr(args, kw) for kw in ["minThreshold", "maxThreshold", "circularity", "convexity", "inertia", "refine", "depth"]}
+        else:
+            params = {"n": args.n, "o": args.o, "j": args.j}
+        ids = submit_folders(con, args.folders, args.kind, params, batch=args.batch)
+        print(f"Submitted {len(ids):d} {args.kind} jobs")
+    elif args.action == "work":
+        n_done = work(queue_dir, lease_time=args.lease, poll=args.poll, keep_alive=args.keep_alive)
+        print(f"Completed {n_done:d} jobs")
+    elif args.action == "collect":
+        con = connect(queue_dir)
+        while True:
+            n = collect(con, queue_dir)
+            if n > 0:
+                print(f"Merged {n:d} jobs")
+            status = count(con)
+            if not args.wait or status.get("pending", 0) + status.get("leased", 0) + status.get("done", 0) == 0:
+                break
+            time.sleep(args.poll)
+    else:
+        con = connect(queue_dir)
+        for status, n in count(con).items():
+            print(f"{status}: {n:d}")
+        for job in con.execute("SELECT id, folder, error FROM jobs WHERE status = 'failed'"):
+            print(f"job {job['id']:d} failed ({job['folder']}):\n{job['error']}")
+
+if __name__ == "__main__":
+    # the arguments are defined in cli.py
+    from cli import main as cli_main
+    cli_main(["queue"] + sys.argv[1:])
@@ -8,52 +8,69 @@ Saves the overlay images in a new folder "overlay".
 Syntax
 ------
 
-python overlay.py folder
+python overlay.py folder [--dpi dpi] [--depth depth]
 
 Edit
 ----
 * Apr 21, 2025: Initial commit.
+* Oct 19, 2026: Wrap the script in `main`, so that importing it has no side effects and it can be run by `cli.py overlay`.
+* Oct 19, 2026: Prefetch the images and save the overlays in background threads (see `pipeline.py`), with the queue depth set by --depth. Draw with `Figure` instead of pyplot, which is not thread-safe.
+* Oct 19, 2026: Note that only the reading and file writes overlap with the drawing. Rendering in `savefig` holds the GIL, so it still competes with the drawing of the next overlay.
 """
 
 import os
-import argparse
+import sys
 import pandas as pd
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.patches import Circle
 from skimage import io
 from myimagelib import readdata
+from pipeline import prefetch, AsyncWriter
 
-parser = argparse.ArgumentParser(description='Overlay droplets on images')
-parser.add_argument('folder', type=str, help='Folder containing images and data')
-parser.add_argument('--dpi', type=int, default=300, help='Set the dpi of the saved images')
-args = parser.parse_args()
-
-# input args
-folder = os.path.abspath(args.folder)
-dpi = args.dpi
-
-save_folder = os.path.join(folder, "overlay")
-os.makedirs(save_folder, exist_ok=True)
-
-l = readdata(folder, "jpg")
-img = io.imread(l.Dir[0])
-h, w = img.shape[:2]
-for num, i in l.iterrows():
-    if os.path.exists(os.path.join(save_folder, f"{i.Name}.jpg")):
-        continue
-    data_path = os.path.join(folder, f"{i.Name}.csv")
-    img = io.imread(i.Dir)
-    plt.figure(figsize=(w/dpi,h/dpi), dpi=dpi)
-    plt.imshow(img)
-    plt.axis("off")
+def read_frame(folder, name, path):
+    """Reads an image and its droplet data. The data is None if the .csv file is missing or cannot be read."""
+    img = io.imread(path)
     try:
-        drops = pd.read_csv(data_path)
-        for _, drop in drops.iterrows():
-            x, y, r = drop[["x", "y", "r"]].astype(int)
-            circle = plt.Circle((x, y), r, color='yellow', fill=False, linewidth=2)
-            plt.gca().add_artist(circle)
+        drops = pd.read_csv(os.path.join(folder, f"{name}.csv"))
     except:
-        pass
+        drops = None
+    return img, drops
 
-    # save image
-    plt.savefig(os.path.join(save_folder, f"{i.Name}.jpg"), bbox_inches="tight", pad_inches=0)
-    plt.close()
\ No newline at end of file
+def main(args):
+    """Overlays the detected droplets on the images in args.folder and saves them in the "overlay" subfolder."""
+    # input args
+    folder = os.path.abspath(args.folder)
+    dpi = args.dpi
+
+    save_folder = os.path.join(folder, "overlay")
+    os.makedirs(save_folder, exist_ok=True)
+
+    l = readdata(folder, "jpg")
+    img = io.imread(l.Dir[0])
+    h, w = img.shape[:2]
+    l = l.loc[[not os.path.exists(os.path.join(save_folder, f"{name}.jpg")) for name in l.Name]]
+
+    # read the upcoming images and save the overlays in the background, while the current overlay is drawn
+    # Figure is used instead of pyplot, because pyplot is not thread-safe
+    frames = prefetch(zip(l.Name, l.Dir), lambda item: read_frame(folder, *item), depth=args.depth)
+    with AsyncWriter(depth=args.depth) as writer:
+        for name, (img, drops) in zip(l.Name, frames):
+            fig = Figure(figsize=(w/dpi,h/dpi), dpi=dpi)
+            ax = fig.add_subplot()
+            ax.imshow(img)
+            ax.axis("off")
+            try:
+                for _, drop in drops.iterrows():
+                    x, y, r = drop[["x", "y", "r"]].astype(int)
+                    circle = Circle((x, y), r, color='yellow', fill=False, linewidth=2)
+                    ax.add_artist(circle)
+            except:
+                pass
+
+            # save image
+            writer.submit(fig.savefig, os.path.join(save_folder, f"{name}.jpg"), bbox_inches="tight", pad_inches=0)
+
+if __name__ == "__main__":
+    # the arguments are defined in cli.py
+    from cli import main as cli_main
+    cli_main(["overlay"] + sys.argv[1:])
@@ -0,0 +1,100 @@
+"""
+pipeline.py
+===========
+
+Helpers to overlap the disk I/O with the computation in the frame loops of `find_drops.py` and `overlay.py`:
+
+* `prefetch` reads and decodes the upcoming frames in a thread pool, while the current frame is processed;
+* `AsyncWriter` saves the results (`df.to_csv`, `fig.savefig`, ...) in a background thread, while the next frame is processed.
+
+The number of frames held in memory is capped by the queue depth: at most `depth` frames are being read or waiting to be processed, and at most `depth` results are waiting to be written. What overlaps with the computation is the part that releases the GIL: reading files, decoding JPEGs with cv2, and the write system calls. On network drives such as "G:\\My Drive", this hides the read and write latency. Formatting the results (`df.to_csv` builds the text in Python/Cython, `fig.savefig` renders with Agg) holds the GIL, so the writer thread competes with the detection for it. That part is moved off the critical path but not made parallel, and the gain is small when the disk is fast.
+
+Edit
+----
+* Oct 19, 2026: Initial commit.
+* Oct 19, 2026: Keep the error of the `with` block over a write error, and check that depth is at least 1.
+* Oct 19, 2026: Correct the docstring: formatting the results holds the GIL, only the file I/O overlaps with the computation.
+"""
+
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+def prefetch(items, read, depth=4, workers=None):
+    """Yields read(item) for each item, in order. Up to depth items are read ahead by a pool of workers threads (default to depth)."""
+    if depth < 1:
+        raise ValueError(f"depth must be at least 1, got {depth}")
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=workers or depth) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(read, item))
+            if len(pending) >= depth:
+                break
+        while pending:
+            result = pending.popleft().result()
+            # submit the next read before handing the current frame to the caller
+            for item in items:
+                pending.append(executor.submit(read, item))
+                break
+            yield result
+
+class AsyncWriter:
+    """Runs write calls in a background thread, in the order they are submitted. `submit` blocks when depth calls are waiting, to cap the memory held by the results. An error raised by a write call is raised again by the next `submit` or by `close`, unless the `with` block is already exiting on an error of its own.
+
+    Use as a context manager, so that all the results are written when the loop ends:
+
+    with AsyncWriter(depth=4) as writer:
+        for ...:
+            writer.submit(df.to_csv, path, index=False)
+    """
+    def __init__(self, depth=4):
+        if depth < 1:
+            raise ValueError(f"depth must be at least 1, got {depth}")
+        self.queue = queue.Queue(maxsize=depth)
+        self.error = None
+        self.thread = threading.Thread(target=self._drain, daemon=True)
+        self.thread.start()
+
+    def _drain(self):
+        while True:
+            task = self.queue.get()
+            if task is None:
+                break
+            func, args, kwargs = task
+            if self.error is None:
+                try:
+                    func(*args, **kwargs)
+                except Exception as e:
+                    self.error = e
+
+    def _raise(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def submit(self, func, *args, **kwargs):
+        """Queues func(*args, **kwargs) to be run in the background thread."""
+        self._raise()
+        self.queue.put((func, args, kwargs))
+
+    def _join(self):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+    def close(self):
+        """Waits for all the queued calls to finish."""
+        self._join()
+        self._raise()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # the error of the loop body takes precedence over a write error
+            self._join()
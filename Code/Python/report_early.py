@@ -6,30 +6,36 @@ This script processes droplet detection results to generate "report" graphs. It
 
 Syntax
 ------
-python report_early.py folder [-n nBins] [-o overlap]
+python report_early.py folder [-n nBins] [-o overlap] [-j workers] [--output output]
 
 Edit
 ----
 * Apr 14, 2025: Initial commit.
 * Apr 21, 2025: (i) Save the data in h5 format. (ii) Fix the flux calculation by dividng by the area of the band.
 * Apr 24, 2025: Fix bin calculation.
+* Oct 19, 2026: Append the spatial statistics (coverage, nearest-neighbour and gap distances, Voronoi cells, g(r)) computed by `spatial_stats.py`.
+* Oct 19, 2026: Set the matplotlib style in `main` instead of on import, and move the report to `main`, so that the script can be run by `cli.py report`.
+* Oct 19, 2026: Add --output, to save nrvf.h5 and report_early.pdf in another folder.
 """
 
-import argparse
 import os
+import sys
 from myimagelib import readdata
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-import matplotlib
-matplotlib.rcParams["font.family"] = "STIXGeneral"
-matplotlib.rcParams["mathtext.fontset"] = "stix"
-matplotlib.rcParams["xtick.direction"] = "in"
-matplotlib.rcParams["ytick.direction"] = "in"
-plt.rcParams['xtick.major.size'] = 2  # Length of major ticks
-plt.rcParams['ytick.major.size'] = 2  # Length of major ticks
-plt.rcParams['xtick.minor.size'] = 1  # Length of minor ticks
-plt.rcParams['ytick.minor.size'] = 1  # Length of minor ticks
+from spatial_stats import compute_spatial_statistics, store_spatial_statistics
+
+def set_style():
+    """Sets the matplotlib style of the report graphs."""
+    import matplotlib
+    matplotlib.rcParams["font.family"] = "STIXGeneral"
+    matplotlib.rcParams["mathtext.fontset"] = "stix"
+    matplotlib.rcParams["xtick.direction"] = "in"
+    matplotlib.rcParams["ytick.direction"] = "in"
+    matplotlib.rcParams['xtick.major.size'] = 2  # Length of major ticks
+    matplotlib.rcParams['ytick.major.size'] = 2  # Length of major ticks
+    matplotlib.rcParams['xtick.minor.size'] = 1  # Length of minor ticks
+    matplotlib.rcParams['ytick.minor.size'] = 1  # Length of minor ticks
 
 def read_info(folder):
     """Reads the experimental information from file info.txt"""
@@ -121,14 +127,13 @@ def compute_volume_and_flux(folder, start_time, interval, mpp, center, image_dim
 
     return volume, flux, bins, binsize
 
-if __name__=="__main__":
-    parser = argparse.ArgumentParser(description="Generate report graphs for early data.")
-    parser.add_argument("folder", type=str, help="Path to the folder containing the droplet detection results.")
-    parser.add_argument("-n", type=int, default=5, help="Number of bins for volume and flux calculation.")
-    parser.add_argument("-o", type=float, default=0, help="fraction of overlap in binning.")
-    args = parser.parse_args()
+def main(args):
+    """Computes the report data of args.folder, saves it in nrvf.h5 and plots it in report_early.pdf, in args.output (default to args.folder)."""
+    import matplotlib.pyplot as plt
+    set_style()
 
     folder = args.folder
+    output = args.output or folder
     if not os.path.exists(folder):
         raise FileNotFoundError(f"The specified folder does not exist: {folder}")
     
@@ -153,8 +158,11 @@ if __name__=="__main__":
         p = np.polyfit(x, y, 1)
         p_list.append(p[0])
 
+    # compute spatial statistics: coverage, nearest-neighbour and gap distances, Voronoi cells and g(r)
+    spatial, g, g_r, droplets = compute_spatial_statistics(folder, info["start_time"], info["interval"], info["mpp"], info["image_dims"], workers=args.j)
+
     # Save N, radii, volume and flux data to an h5 file
-    save_path = os.path.join(folder, "nrvf.h5")
+    save_path = os.path.join(output, "nrvf.h5")
     with pd.HDFStore(save_path, mode="w") as store:
         store["center"] = pd.Series([x0, y0, R], index=["x", "y", "R"])
         store["bins"] = pd.Series(bins, index=np.arange(len(bins)))
@@ -164,6 +172,7 @@ if __name__=="__main__":
         store["V"] = V
         store["F"] = F
         store["Fx"] = pd.DataFrame({"x": bins, "F": p_list})
+        store_spatial_statistics(store, spatial, g, g_r, droplets)
 
     # Make plots
     fig = plt.figure(figsize=(7, 7))
@@ -199,6 +208,21 @@ if __name__=="__main__":
     ax5.set_xlabel("Distance $x/R$")
     ax5.set_ylabel("Flux (mm/min)")
 
+    ax6 = fig.add_subplot(326)
+    ax6.plot(spatial["t"], spatial["coverage"], ls="--", marker="o")
+    ax6.set_xlabel("Time (min)")
+    ax6.set_ylabel("Coverage")
+    ax7 = ax6.twinx()
+    ax7.plot(spatial["t"], spatial["gap_mean"], ls="--", marker="s", color="C1")
+    ax7.set_ylabel("Mean gap (um)", color="C1")
+
     plt.tight_layout()
     
-    fig.savefig(os.path.join(folder, "report_early.pdf"))
+    fig.savefig(os.path.join(output, "report_early.pdf"))
+    plt.close(fig)
+
+if __name__=="__main__":
+    # the arguments are defined in cli.py
+    from cli import main as cli_main
+    cli_main(["report"] + sys.argv[1:])
+
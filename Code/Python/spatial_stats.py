@@ -0,0 +1,265 @@
+"""
+spatial_stats.py
+================
+
+This script computes the spatial statistics of the detected droplets in each frame. It works on the per-frame x, y, r tables produced by `find_drops.py` and computes:
+
+1. nearest-neighbour (center-to-center) distances;
+2. gap-to-neighbour (edge-to-edge) distances, i.e. the smallest distance between the rim of a droplet and the rim of any other droplet. Small gaps indicate imminent coalescence;
+3. surface coverage, i.e. the fraction of the image area covered by the union of the droplets;
+4. Voronoi cell areas, from which the local coverage of each droplet is derived;
+5. pair-correlation function g(r).
+
+All neighbour searches are done with KD-tree batch queries and NumPy. Frames are processed in parallel with a process pool. The results are saved in the h5 file of `report_early.py` (nrvf.h5), under the keys "spatial" (one row per frame), "g" (one row per frame, indexed by t, one column per r bin), "g_r" (the r bin centers) and "droplets" (one row per droplet of each frame, for the nearest-neighbour and gap distributions).
+
+Syntax
+------
+python spatial_stats.py folder [-j workers] [--rmax rmax] [--nbins nbins]
+
+Edit
+----
+* Oct 19, 2026: Initial commit.
+* Oct 19, 2026: Move the script to `main`, so that it can be run by `cli.py spatial`.
+* Oct 19, 2026: (i) Make the gap distance exact beyond the k nearest neighbours. (ii) Compute the coverage analytically from the pair overlaps. (iii) Save the per-droplet statistics and store g(r) with t as index.
+* Oct 19, 2026: (i) Compute the coverage as the union of the droplets clipped to the image, on exact scan lines, since the pair overlaps are wrong for three or more overlapping droplets. (ii) Build the KD-tree once per frame.
+"""
+
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree, Voronoi, QhullError
+
+def nearest_neighbour_distance(xy, tree=None):
+    """Returns the center-to-center distance of each droplet to its nearest neighbour. NaN if there is only one droplet."""
+    if len(xy) < 2:
+        return np.full(len(xy), np.nan)
+    if tree is None:
+        tree = cKDTree(xy)
+    d, _ = tree.query(xy, k=2)
+    return d[:, 1]
+
+def gap_distance(xy, r, tree=None, k=10):
+    """Returns the edge-to-edge distance of each droplet to its closest neighbour.
+
+    The gap between droplets i and j is |c_i - c_j| - r_i - r_j, which is negative when the droplets overlap. The smallest gap is first searched among the k nearest neighbours of each droplet. A droplet farther than the k-th neighbour, at distance d_k, can only have a smaller gap if d_k - r_i - max(r) is smaller than the current best gap, so for these droplets all the neighbours within best + r_i + max(r) are checked as well, which makes the result exact."""
+    n = len(xy)
+    if n < 2:
+        return np.full(n, np.nan)
+    if tree is None:
+        tree = cKDTree(xy)
+    k = min(k, n - 1) + 1
+    d, ind = tree.query(xy, k=k)
+    # drop the first column, which is the droplet itself
+    gap = (d[:, 1:] - r[:, None] - r[ind[:, 1:]]).min(axis=1)
+    if k == n:
+        return gap
+
+    # droplets whose closest rim may lie beyond the k-th neighbour
+    reach = gap + r + r.max()
+    check = np.flatnonzero(d[:, -1] < reach)
+    if len(check) > 0:
+        neighbours = tree.query_ball_point(xy[check], reach[check])
+        lengths = np.array([len(nb) for nb in neighbours])
+        i = np.repeat(check, lengths)
+        j = np.concatenate(neighbours).astype(int)
+        pair_gap = np.linalg.norm(xy[i] - xy[j], axis=1) - r[i] - r[j]
+        pair_gap[i == j] = np.inf
+        # the ball always contains the droplet itself, so every segment is non-empty
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        gap[check] = np.minimum(gap[check], np.minimum.reduceat(pair_gap, starts))
+    return gap
+
+def coverage(xy, r, image_dims, ss=16):
+    """Returns the fraction of the image area covered by the union of the droplets, clipped to the image, so that overlapping (or nested, or duplicated) droplets are counted once and the parts of droplets outside the image are not counted.
+
+    The union is integrated on ss horizontal scan lines per px: on each line, the chord of each droplet is an exact interval, and the length of the union of the intervals is computed exactly. The only error is from the line sampling in y: at the default ss, it is about 0.2% of the area of a droplet of r = 1 px and 0.003% for r = 10 px."""
+    w, h = image_dims[0], image_dims[1]
+    n = len(xy)
+    if n == 0:
+        return 0.0
+    x, y = xy[:, 0], xy[:, 1]
+    n_lines = int(np.ceil(h * ss))
+    dy = h / n_lines
+
+    # the scan lines (j + 0.5) * dy crossed by each droplet
+    first = np.clip(np.ceil((y - r) / dy - 0.5), 0, n_lines).astype(int)
+    last = np.clip(np.floor((y + r) / dy - 0.5), -1, n_lines - 1).astype(int)
+    counts = np.maximum(last - first + 1, 0)
+    c = np.repeat(np.arange(n), counts)
+    line = first[c] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    # chord of each droplet on each of its lines, clipped to [0, w]
+    half = np.sqrt(np.clip(r[c]**2 - ((line + 0.5) * dy - y[c])**2, 0, None))
+    start = np.clip(x[c] - half, 0, w)
+    end = np.clip(x[c] + half, 0, w)
+
+    # union length of the intervals of each line: sort by line and start, then count the part of each interval beyond the farthest end so far.
+    # Shifting each line by line * (w + 1) keeps the running maximum from leaking into the next line.
+    order = np.lexsort((start, line))
+    offset = line[order] * (w + 1.0)
+    start, end = start[order] + offset, end[order] + offset
+    reach = np.concatenate([[-np.inf], np.maximum.accumulate(end)[:-1]])
+    length = np.clip(end - np.maximum(start, reach), 0, None).sum()
+    return length * dy / (w * h)
+
+def voronoi_area(xy, image_dims):
+    """Returns the area of the Voronoi cell of each droplet. Cells that are unbounded or extend beyond the image are cut by the image boundary in reality, so their area is set to NaN."""
+    n = len(xy)
+    area = np.full(n, np.nan)
+    if n < 4:
+        return area
+    try:
+        vor = Voronoi(xy)
+    except QhullError:
+        # e.g. all the droplets on a line
+        return area
+    regions = [vor.regions[j] for j in vor.point_region]
+    lengths = np.array([len(reg) for reg in regions])
+    verts = np.concatenate([reg for reg in regions if len(reg) > 0]).astype(int)
+
+    # a cell is valid when it is bounded and all its vertices are inside the image
+    v = vor.vertices
+    inside = (v[:, 0] >= 0) & (v[:, 0] <= image_dims[0]) & (v[:, 1] >= 0) & (v[:, 1] <= image_dims[1])
+    has_region = lengths > 0
+    starts = np.concatenate([[0], np.cumsum(lengths[has_region])[:-1]])
+    valid_vert = np.where(verts >= 0, inside[verts], False)
+    valid = np.zeros(n, dtype=bool)
+    valid[has_region] = np.logical_and.reduceat(valid_vert, starts)
+
+    # shoelace formula on all cells at once, each vertex is paired with the next one in its cell
+    idx = np.arange(len(verts))
+    nxt = idx + 1
+    ends = starts + lengths[has_region]
+    nxt[ends - 1] = starts
+    p, q = v[verts], v[verts[nxt]]
+    cross = p[:, 0] * q[:, 1] - q[:, 0] * p[:,1]
+    cell_area = np.zeros(n)
+    cell_area[has_region] = 0.5 * np.abs(np.add.reduceat(cross, starts))
+    area[valid] = cell_area[valid]
+    return area
+
+def pair_correlation(xy, image_dims, rbins, tree=None):
+    """Computes the pair-correlation function g(r) at the bin centers of rbins.
+
+    Edge effects are corrected by using only the droplets that are at least rbins[-1] away from the image boundary as reference points, while their neighbours are counted among all droplets (tree, built if not given)."""
+    n = len(xy)
+    w, h = image_dims[0], image_dims[1]
+    g = np.full(len(rbins) - 1, np.nan)
+    rmax = rbins[-1]
+    interior = (xy[:, 0] >= rmax) & (xy[:, 0] <= w - rmax) & (xy[:, 1] >= rmax) & (xy[:, 1] <= h - rmax)
+    n_ref = interior.sum()
+    if n < 2 or n_ref == 0:
+        return g
+    if tree is None:
+        tree = cKDTree(xy)
+    ref_tree = cKDTree(xy[interior])
+    # cumulative number of pairs within each radius, then number of pairs in each annulus
+    counts = np.diff(ref_tree.count_neighbors(tree, rbins))
+    density = n / (w * h)
+    shell = np.pi * np.diff(rbins**2)
+    g = counts / (n_ref * density * shell)
+    return g
+
+def droplet_statistics(xyr, image_dims, k=10, tree=None):
+    """Computes the per-droplet statistics of a frame: nearest-neighbour distance, gap distance, Voronoi cell area and local coverage (droplet area / cell area). All lengths are in px. tree is the KD-tree of the droplet centers, built if not given."""
+    xy = xyr[["x", "y"]].to_numpy(dtype=float)
+    r = xyr["r"].to_numpy(dtype=float)
+    if tree is None and len(xy) > 0:
+        tree = cKDTree(xy)
+    stats = pd.DataFrame({
+        "nn": nearest_neighbour_distance(xy, tree),
+        "gap": gap_distance(xy, r, tree, k=k),
+        "cell": voronoi_area(xy, image_dims),
+    }, index=xyr.index)
+    stats["local_coverage"] = np.pi * r**2 / stats["cell"]
+    return stats
+
+def frame_statistics(csv_path, image_dims, rbins, gap_threshold=1.0, k=10):
+    """Reads the detection result of one frame and summarizes its spatial statistics. Returns a Series of scalar statistics, the g(r) array and the per-droplet statistics, all in px."""
+    xyr = pd.read_csv(csv_path)
+    xy = xyr[["x", "y"]].to_numpy(dtype=float)
+    r = xyr["r"].to_numpy(dtype=float)
+    # one KD-tree for all the neighbour searches of the frame
+    tree = cKDTree(xy) if len(xy) > 0 else None
+    stats = droplet_statistics(xyr, image_dims, k=k, tree=tree)
+    summary = pd.Series({
+        "N": len(xyr),
+        "coverage": coverage(xy, r, image_dims),
+        "nn_mean": stats.nn.mean(),
+        "nn_std": stats.nn.std(),
+        "gap_mean": stats.gap.mean(),
+        "gap_min": stats.gap.min(),
+        "n_close": (stats.gap < gap_threshold).sum(),
+        "cell_mean": stats.cell.mean(),
+        "cell_std": stats.cell.std(),
+        "local_coverage_mean": stats.local_coverage.mean(),
+    })
+    g = pair_correlation(xy, image_dims, rbins, tree=tree)
+    return summary, g, stats
+
+def compute_spatial_statistics(folder, start_time, interval, mpp, image_dims, rmax=None, nbins=50, gap_threshold=1.0, workers=None):
+    """Computes the spatial statistics of all the frames in folder, in parallel.
+
+    Returns:
+    * spatial: DataFrame of the per-frame statistics;
+    * g: DataFrame of g(r), indexed by t, one column per r bin;
+    * r: Series of the r bin centers, indexed by the columns of g;
+    * droplets: DataFrame of the per-droplet statistics (nn, gap, cell, local_coverage) of all the frames, with the frame number and t, from which the nearest-neighbour and gap distributions are obtained.
+
+    Lengths are converted to um and areas to um^2, rmax and gap_threshold are in px. If rmax is not given, it is set to 1/4 of the smaller image dimension."""
+    from myimagelib import readdata
+    l = readdata(folder, "csv")
+    if rmax is None:
+        rmax = min(image_dims) / 4
+    rbins = np.linspace(0, rmax, nbins + 1)
+
+    func = partial(frame_statistics, image_dims=image_dims, rbins=rbins, gap_threshold=gap_threshold)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(func, l.Dir, chunksize=max(1, len(l) // (4 * (workers or os.cpu_count() or 1)))))
+
+    t = np.arange(len(results)) * interval / 60 + start_time / 60
+    spatial = pd.DataFrame([summary for summary, _, _ in results]).reset_index(drop=True)
+    for kw in ["nn_mean", "nn_std", "gap_mean", "gap_min"]:
+        spatial[kw] *= mpp
+    for kw in ["cell_mean", "cell_std"]:
+        spatial[kw] *= mpp**2
+    spatial["t"] = t
+
+    g = pd.DataFrame(np.array([g for _, g, _ in results]).reshape(len(results), nbins), index=pd.Index(t, name="t"))
+    r = pd.Series((rbins[1:] + rbins[:-1]) / 2 * mpp, index=g.columns)
+
+    droplets = pd.concat([stats.assign(frame=num, t=t[num]) for num, (_, _, stats) in enumerate(results)], ignore_index=True) if results else pd.DataFrame(columns=["nn", "gap", "cell", "local_coverage", "frame", "t"])
+    droplets[["nn", "gap"]] *= mpp
+    droplets["cell"] *= mpp**2
+
+    return spatial, g, r, droplets
+
+def store_spatial_statistics(store, spatial, g, r, droplets):
+    """Saves the results of `compute_spatial_statistics` in an open HDFStore."""
+    store["spatial"] = spatial
+    store["g"] = g
+    store["g_r"] = r
+    store["droplets"] = droplets
+
+def main(args):
+    """Computes the spatial statistics of args.folder and appends them to nrvf.h5."""
+    from report_early import read_info
+
+    folder = args.folder
+    if not os.path.exists(folder):
+        raise FileNotFoundError(f"The specified folder does not exist: {folder}")
+
+    info = read_info(folder)
+    results = compute_spatial_statistics(folder, info["start_time"], info["interval"], info["mpp"], info["image_dims"], rmax=args.rmax, nbins=args.nbins, workers=args.j)
+
+    # append to the report data
+    with pd.HDFStore(os.path.join(folder, "nrvf.h5"), mode="a") as store:
+        store_spatial_statistics(store, *results)
+
+if __name__=="__main__":
+    # the arguments are defined in cli.py
+    from cli import main as cli_main
+    cli_main(["spatial"] + sys.argv[1:])
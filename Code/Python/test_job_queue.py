@@ -0,0 +1,189 @@
+"""
+test_job_queue.py
+=================
+
+Checks `job_queue.py` by starting several worker processes against a temporary queue folder. The detection is replaced by a stub handler, so the tests only need the standard library and pytest. Workers are started with fork, so the tests are skipped where fork is not available (Windows).
+
+Syntax
+------
+python -m pytest test_job_queue.py
+
+Edit
+----
+* Oct 19, 2026: Initial commit.
+* Oct 19, 2026: Check collect against a lease taken during its scan and a missing staging folder, and the rollback of a failed COMMIT.
+"""
+
+import os
+import json
+import time
+import signal
+import sqlite3
+import multiprocessing
+import pytest
+import job_queue as jq
+
+pytestmark = pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="workers are started with fork")
+
+def stub_detect(job, staging, lost):
+    """Writes one .csv per frame, containing the pid of the worker."""
+    for name in json.loads(job["payload"])["names"]:
+        time.sleep(0.01)
+        with open(os.path.join(staging, f"{name}.csv"), "w") as f:
+            f.write(f"x,y,r\n{os.getpid()},0,1\n")
+
+def hang(job, staging, lost):
+    """Never finishes, so that the worker can be killed in the middle of a lease."""
+    time.sleep(3600)
+
+def slow_detect(job, staging, lost):
+    """Takes longer than the lease time, and logs each run."""
+    # staging is queue_dir/results/{job_id}_{worker}
+    with open(os.path.join(staging, "..", "..", "runs.log"), "a") as f:
+        f.write(f"{job['id']:d}\n")
+    time.sleep(2)
+    stub_detect(job, staging, lost)
+
+def run_worker(queue_dir, handler, lease_time):
+    jq.HANDLERS["detect"] = handler
+    jq.work(queue_dir, lease_time=lease_time, poll=0.1)
+
+def submit_frames(queue_dir, folder, n_frames, batch):
+    con = jq.connect(queue_dir)
+    names = [f"{i:04d}" for i in range(n_frames)]
+    for start in range(0, n_frames, batch):
+        jq.submit(con, "detect", folder, {"names": names[start:start+batch], "params": {}})
+    return con, names
+
+def test_workers_merge_all_frames_after_kill(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    queue_dir, folder = str(tmp_path / "queue"), str(tmp_path / "exp")
+    os.makedirs(folder)
+    con, names = submit_frames(queue_dir, folder, 200, 10)
+
+    # a worker that dies in the middle of its first job
+    dead = ctx.Process(target=run_worker, args=(queue_dir, hang, 1))
+    dead.start()
+    while con.execute("SELECT COUNT(*) FROM jobs WHERE status = 'leased'").fetchone()[0] == 0:
+        time.sleep(0.05)
+    os.kill(dead.pid, signal.SIGKILL)
+    dead.join()
+
+    workers = [ctx.Process(target=run_worker, args=(queue_dir, stub_detect, 1)) for _ in range(4)]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join(timeout=60)
+        assert p.exitcode == 0
+
+    assert jq.count(con) == {"done": 20}
+    assert jq.collect(con, queue_dir) == 20
+    assert jq.count(con) == {"merged": 20}
+    assert sorted(os.listdir(folder)) == [f"{name}.csv" for name in names]
+    # the job of the dead worker was leased again, and its staging folder removed
+    assert con.execute("SELECT MAX(attempts) FROM jobs").fetchone()[0] == 2
+    assert os.listdir(os.path.join(queue_dir, "results")) == []
+    pids = {open(os.path.join(folder, f)).read() for f in os.listdir(folder)}
+    assert len(pids) > 1
+
+def test_heartbeat_keeps_long_job(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    queue_dir, folder = str(tmp_path / "queue"), str(tmp_path / "exp")
+    os.makedirs(folder)
+    con, names = submit_frames(queue_dir, folder, 5, 5)
+
+    first = ctx.Process(target=run_worker, args=(queue_dir, slow_detect, 0.6))
+    first.start()
+    time.sleep(0.3)
+    second = ctx.Process(target=run_worker, args=(queue_dir, slow_detect, 0.6))
+    second.start()
+    first.join(timeout=30)
+    second.join(timeout=30)
+
+    # the job outlived its lease time, but was never given to the second worker
+    with open(os.path.join(queue_dir, "runs.log")) as f:
+        assert f.read().split() == ["1"]
+    assert jq.count(con) == {"done": 1}
+
+def test_lost_lease_drops_result(tmp_path, monkeypatch):
+    queue_dir, folder = str(tmp_path / "queue"), str(tmp_path / "exp")
+    os.makedirs(folder)
+    con, names = submit_frames(queue_dir, folder, 5, 5)
+
+    def locked(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    def wait_for_loss(job, staging, lost):
+        stub_detect(job, staging, lost)
+        assert lost.wait(10)
+        raise jq.LeaseLost("lost")
+
+    # the heartbeat cannot renew the lease, so the worker gives up the job each time instead of completing it,
+    # until the expired lease has been retried max_attempts times
+    monkeypatch.setattr(jq, "heartbeat", locked)
+    monkeypatch.setitem(jq.HANDLERS, "detect", wait_for_loss)
+    assert jq.work(queue_dir, lease_time=0.3, poll=0.1, max_attempts=2) == 0
+
+    job = con.execute("SELECT * FROM jobs").fetchone()
+    assert job["status"] == "failed"
+    assert job["attempts"] == 2
+    assert job["error"] == "lease expired"
+    assert os.listdir(os.path.join(queue_dir, "results")) == []
+    assert os.listdir(folder) == []
+
+def test_collect_keeps_staging_of_new_lease(tmp_path, monkeypatch):
+    queue_dir, folder = str(tmp_path / "queue"), str(tmp_path / "exp")
+    os.makedirs(os.path.join(queue_dir, "results"))
+    os.makedirs(folder)
+    con, names = submit_frames(queue_dir, folder, 5, 5)
+    worker_con = jq.connect(queue_dir)
+    walk = os.walk
+
+    # a worker leases the job and starts writing while collect scans the staging folders
+    def walk_during_lease(path):
+        job = jq.lease(worker_con, "w", 60)
+        staging = os.path.join(queue_dir, "results", f"{job['id']:06d}_w")
+        os.makedirs(staging)
+        stub_detect(job, staging, None)
+        return walk(path)
+
+    monkeypatch.setattr(os, "walk", walk_during_lease)
+    assert jq.collect(con, queue_dir) == 0
+    monkeypatch.setattr(os, "walk", walk)
+
+    staging = os.path.join(queue_dir, "results", "000001_w")
+    assert len(os.listdir(staging)) == 5
+    assert jq.complete(worker_con, 1, "w", staging)
+    assert jq.collect(con, queue_dir) == 1
+    assert sorted(os.listdir(folder)) == [f"{name}.csv" for name in names]
+
+def test_collect_requeues_missing_staging(tmp_path):
+    queue_dir, folder = str(tmp_path / "queue"), str(tmp_path / "exp")
+    os.makedirs(folder)
+    con, names = submit_frames(queue_dir, folder, 5, 5)
+    jq.lease(con, "w", 60)
+    assert jq.complete(con, 1, "w", os.path.join(queue_dir, "results", "000001_w"))
+
+    assert jq.collect(con, queue_dir) == 0
+    job = con.execute("SELECT * FROM jobs").fetchone()
+    assert job["status"] == "pending"
+    assert job["error"].startswith("staging folder missing")
+
+def test_failed_commit_rolls_back(tmp_path):
+    queue_dir, folder = str(tmp_path / "queue"), str(tmp_path / "exp")
+    os.makedirs(folder)
+    con, names = submit_frames(queue_dir, folder, 5, 5)
+    con.execute("PRAGMA busy_timeout = 100")
+
+    # a reader holding a shared lock makes COMMIT fail with "database is locked"
+    reader = sqlite3.connect(os.path.join(queue_dir, "jobs.db"), isolation_level=None)
+    reader.execute("BEGIN")
+    reader.execute("SELECT * FROM jobs").fetchall()
+    with pytest.raises(sqlite3.OperationalError):
+        jq.lease(con, "w", 60)
+    assert not con.in_transaction
+    reader.execute("COMMIT")
+
+    # the connection can start a new transaction, and the failed lease left no trace
+    assert jq.lease(con, "w", 60)["id"] == 1
+    assert jq.count(con) == {"leased": 1}
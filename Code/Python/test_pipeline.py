@@ -0,0 +1,55 @@
+"""
+test_pipeline.py
+================
+
+Checks the ordering, the memory bound and the error handling of `pipeline.py`.
+
+Syntax
+------
+python -m pytest test_pipeline.py
+
+Edit
+----
+* Oct 19, 2026: Initial commit.
+"""
+
+import time
+import pytest
+from pipeline import prefetch, AsyncWriter
+
+def test_prefetch_order_and_depth():
+    started = []
+    def read(i):
+        started.append(i)
+        time.sleep(0.01 * (i % 3))
+        return i * i
+    for i, result in enumerate(prefetch(range(20), read, depth=3)):
+        assert result == i * i
+        # besides the items already yielded, at most depth upcoming ones have been submitted
+        assert len(started) <= i + 1 + 3
+    assert list(prefetch([], read)) == []
+
+def test_writer_order():
+    out = []
+    with AsyncWriter(depth=2) as writer:
+        for i in range(20):
+            writer.submit(out.append, i)
+    assert out == list(range(20))
+
+def test_writer_error_is_raised():
+    with pytest.raises(ZeroDivisionError):
+        with AsyncWriter(depth=2) as writer:
+            writer.submit(lambda: 1 / 0)
+
+def test_body_error_takes_precedence():
+    with pytest.raises(KeyError):
+        with AsyncWriter(depth=2) as writer:
+            writer.submit(lambda: 1 / 0)
+            raise KeyError("body")
+
+@pytest.mark.parametrize("depth", [0, -1])
+def test_depth_must_be_positive(depth):
+    with pytest.raises(ValueError):
+        AsyncWriter(depth=depth)
+    with pytest.raises(ValueError):
+        list(prefetch(range(3), str, depth=depth))
@@ -0,0 +1,154 @@
+"""
+test_spatial_stats.py
+=====================
+
+Behaviour checks of `spatial_stats.py` on droplet arrangements with known answers.
+
+Syntax
+------
+python -m pytest test_spatial_stats.py
+
+Edit
+----
+* Oct 19, 2026: Initial commit.
+* Oct 19, 2026: Check the coverage against a supersampled raster, with nested, duplicated and edge-cut droplets.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.spatial import Voronoi
+from spatial_stats import nearest_neighbour_distance, gap_distance, coverage, voronoi_area, pair_correlation, droplet_statistics, frame_statistics
+
+def lattice(n=10, a=20.0):
+    """Square lattice of n x n droplets of spacing a, centered in an image of size n*a x n*a."""
+    x, y = np.meshgrid(np.arange(n) * a + a / 2, np.arange(n) * a + a / 2)
+    return np.column_stack([x.ravel(), y.ravel()]), (n * a, n * a)
+
+def test_lattice_nearest_neighbour():
+    xy, _ = lattice()
+    assert np.allclose(nearest_neighbour_distance(xy), 20)
+
+def test_lattice_voronoi_area():
+    xy, dims = lattice()
+    area = voronoi_area(xy, dims)
+    # the cells on the boundary are unbounded, the cells next to them touch the image edge
+    interior = (xy[:, 0] > 20) & (xy[:, 0] < 180) & (xy[:, 1] > 20) & (xy[:, 1] < 180)
+    assert np.allclose(area[interior], 400)
+    assert np.isnan(area[~interior & ((xy[:, 0] < 20) | (xy[:, 1] < 20))]).all()
+
+def test_voronoi_area_matches_loop():
+    rng = np.random.default_rng(0)
+    dims = (500, 400)
+    xy = rng.uniform(0, 1, (300, 2)) * dims
+    vor = Voronoi(xy)
+    expected = np.full(len(xy), np.nan)
+    for i, j in enumerate(vor.point_region):
+        region = vor.regions[j]
+        if len(region) == 0 or -1 in region:
+            continue
+        v = vor.vertices[region]
+        if (v < 0).any() or (v[:, 0] > dims[0]).any() or (v[:, 1] > dims[1]).any():
+            continue
+        x, y = v[:, 0], v[:, 1]
+        expected[i] = 0.5 * abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+    area = voronoi_area(xy, dims)
+    assert np.array_equal(np.isnan(area), np.isnan(expected))
+    assert np.allclose(area[~np.isnan(area)], expected[~np.isnan(expected)])
+    assert (~np.isnan(area)).sum() > 100
+
+def test_lattice_pair_correlation():
+    xy, dims = lattice(n=30, a=10.0)
+    rbins = np.linspace(0, 50, 26)
+    g = pair_correlation(xy, dims, rbins)
+    # no pair closer than the spacing, and the bin (8, 10] holds the 4 nearest neighbours
+    assert np.all(g[:4] == 0)
+    assert g[4] == pytest.approx(4 / (0.01 * np.pi * (10**2 - 8**2)))
+
+def test_pair_correlation_random_is_one():
+    rng = np.random.default_rng(1)
+    dims = (1000, 1000)
+    xy = rng.uniform(0, 1000, (5000, 2))
+    g = pair_correlation(xy, dims, np.linspace(0, 100, 11))
+    assert np.allclose(g[1:], 1, atol=0.1)
+
+def test_gap_distance_beyond_k_nearest():
+    # a small droplet surrounded by a ring of 12 small droplets, next to a large droplet farther away by center
+    angles = np.linspace(0, 2 * np.pi, 12, endpoint=False)
+    ring = np.column_stack([np.cos(angles), np.sin(angles)]) * 10 + 100
+    xy = np.vstack([[100, 100], ring, [100, 100 + 40]])
+    r = np.array([1.0] * 13 + [37.0])
+    gap = gap_distance(xy, r, k=10)
+    # rims of the center droplet and of the large droplet: 40 - 1 - 37
+    assert gap[0] == pytest.approx(2)
+    brute = np.array([min(np.hypot(*(xy[i] - xy[j])) - r[i] - r[j] for j in range(len(xy)) if j != i) for i in range(len(xy))])
+    assert np.allclose(gap, brute)
+
+def test_gap_distance_matches_brute_force():
+    rng = np.random.default_rng(2)
+    xy = rng.uniform(0, 300, (400, 2))
+    r = rng.exponential(3, 400) + 0.5
+    d = np.hypot(*(xy[:, None] - xy[None]).transpose(2, 0, 1)) - r[:, None] - r[None]
+    np.fill_diagonal(d, np.inf)
+    assert np.allclose(gap_distance(xy, r, k=3), d.min(axis=1))
+
+def raster_coverage(xy, r, dims, ss=20):
+    """Brute-force coverage on a supersampled pixel grid."""
+    gx = (np.arange(int(dims[0] * ss)) + 0.5) / ss
+    gy = (np.arange(int(dims[1] * ss)) + 0.5) / ss
+    X, Y = np.meshgrid(gx, gy)
+    covered = np.zeros(X.shape, dtype=bool)
+    for (x, y), rad in zip(xy, r):
+        covered |= (X - x)**2 + (Y - y)**2 < rad**2
+    return covered.mean()
+
+def test_coverage_single_and_disjoint():
+    dims = (100, 100)
+    assert coverage(np.array([[50.0, 50]]), np.array([10.0]), dims) == pytest.approx(np.pi * 100 / 1e4, rel=1e-4)
+    assert coverage(np.array([[50.0, 50]]), np.array([1.0]), dims) == pytest.approx(np.pi / 1e4, rel=2e-3)
+    xy = np.array([[20.0, 20], [60, 60]])
+    assert coverage(xy, np.array([5.0, 10]), dims) == pytest.approx(np.pi * 125 / 1e4, rel=1e-4)
+    assert coverage(np.zeros((0, 2)), np.zeros(0), dims) == 0
+
+def test_coverage_three_identical():
+    # duplicated detections are counted once
+    xy = np.array([[50.0, 50]] * 3)
+    assert coverage(xy, np.array([10.0] * 3), (100, 100)) == pytest.approx(0.0314159, rel=1e-4)
+
+def test_coverage_mutually_overlapping():
+    # four circles that all overlap each other, plus one nested inside another
+    xy = np.array([[50.0, 50], [56, 50], [53, 55], [52, 47], [50, 50]])
+    r = np.array([6.0, 5, 7, 4, 2])
+    dims = (100, 100)
+    assert coverage(xy, r, dims) == pytest.approx(raster_coverage(xy, r, dims), rel=2e-3)
+
+def test_coverage_clipped_to_image():
+    dims = (100, 100)
+    # a droplet centered on a corner only covers a quarter of its area, one centered on an edge half
+    assert coverage(np.array([[0.0, 0]]), np.array([10.0]), dims) == pytest.approx(np.pi * 100 / 4 / 1e4, rel=1e-4)
+    assert coverage(np.array([[50.0, 100]]), np.array([10.0]), dims) == pytest.approx(np.pi * 100 / 2 / 1e4, rel=1e-4)
+
+def test_coverage_random_matches_raster():
+    rng = np.random.default_rng(3)
+    dims = (80, 60)
+    xy = rng.uniform(0, 1, (60, 2)) * dims
+    r = rng.exponential(4, 60) + 0.5
+    assert coverage(xy, r, dims) == pytest.approx(raster_coverage(xy, r, dims), rel=2e-3)
+
+@pytest.mark.parametrize("n", [0, 1, 3])
+def test_small_frames(tmp_path, n):
+    xyr = pd.DataFrame({"x": [10.0, 50, 90][:n], "y": [10.0, 60, 20][:n], "r": [2.0, 3, 4][:n]})
+    stats = droplet_statistics(xyr, (100, 100))
+    assert len(stats) == n
+    if n < 2:
+        assert stats.nn.isna().all() and stats.gap.isna().all()
+    else:
+        assert stats.nn.notna().all() and stats.gap.notna().all()
+    assert stats.cell.isna().all()
+
+    path = tmp_path / "0000.csv"
+    xyr.to_csv(path, index=False)
+    summary, g, stats = frame_statistics(path, (100, 100), np.linspace(0, 20, 5))
+    assert summary.N == n
+    assert summary.coverage == pytest.approx(np.pi * (xyr.r**2).sum() / 1e4, rel=2e-3)
+    assert len(g) == 4